@@ -1,13 +1,37 @@
 import os
-from pytube import YouTube
-from telegram import Update
+import aiofiles
+import aiohttp
+import orjson
+import redis.asyncio as redis
+import yt_dlp
+from telegram import InputFile, LinkPreviewOptions, Update
+from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.request import HTTPXRequest
 import logging
+import logging.handlers
 import asyncio
+import contextlib
+import queue
+import re
+import shutil
+import string
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
-# Enable logging
+# Enable logging; records are queued and written to stderr by a background thread
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+)
+log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
@@ -15,51 +39,184 @@ logger = logging.getLogger(__name__)
 # Get bot token from environment variable (for security)
 BOT_TOKEN = os.environ.get('BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 
-# Store user sessions (simple in-memory storage)
-user_sessions = {}
+# Optional local Bot API server (e.g. 'http://localhost:8081') for large uploads
+LOCAL_API_URL = os.environ.get('LOCAL_API_URL')
+
+# Streaming download settings
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_read=60)
+READ_CHUNK_SIZE = 1024 * 1024   # large reads, far fewer read/write syscalls
+WRITE_BUFFER_SIZE = 64 * 1024   # batch small writes before they hit the disk
+DL_CONNECTIONS = 8              # parallel HTTP Range requests per download
+MIN_PARALLEL_SIZE = 8 * 1024 * 1024  # below this a single connection is enough
+
+# Stage downloads in RAM-backed tmpfs when it has room, else on disk
+SHM_DIR = '/dev/shm'
+SHM_HEADROOM = 64 * 1024 * 1024
+_shm_reserved = 0  # bytes promised to in-flight downloads staged in SHM_DIR
+
+# Translation table that drops every ASCII char not allowed in upload filenames
+_ALLOWED = set(string.ascii_letters + string.digits + ' -_')
+_TRANS = str.maketrans({c: None for c in map(chr, range(128)) if c not in _ALLOWED})
+
+# Cap concurrent downloads so a burst of users queues instead of exhausting disk/RAM
+MAX_PARALLEL_DL = int(os.environ.get('MAX_PARALLEL_DL', '4'))
+DL_SEM = asyncio.Semaphore(MAX_PARALLEL_DL)
+_dl_waiting = 0
+
+# Progress edits are throttled to stay well under Telegram's 30 msg/s bot-wide limit
+PROGRESS_EDIT_INTERVAL = 5  # seconds
+PROGRESS_EDIT_STEP = 10     # percent
+
+# Routes anything that mentions YouTube to the URL handler
+YT_HOST_RE = re.compile(r'youtube\.com|youtu\.be')
+
+# Matches watch, youtu.be, shorts, live and embed URLs and captures the 11-char video id
+YT_RE = re.compile(
+    r'^(?:https?://)?(?:[\w-]+\.)?'
+    r'(?:youtube\.com/(?:watch\?(?:\S*?&)?v=|shorts/|live/|embed/)|youtu\.be/)'
+    r'([A-Za-z0-9_-]{11})'
+)
+
+# Shared yt-dlp options; bot only needs metadata, bytes are fetched with aiohttp.
+# YoutubeDL isn't thread-safe, so each executor thread builds its own instance.
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    # Metadata only: _mp4_formats picks the format, so never fail format selection here
+    'ignore_no_formats_error': True,
+}
+_ydl_local = threading.local()
+
+# yt-dlp metadata cache; the signed googlevideo URLs inside expire after ~6 h,
+# so entries are dropped well before that
+INFO_CACHE_SIZE = 512
+INFO_CACHE_TTL = 30 * 60  # seconds
+_info_cache = OrderedDict()
+_info_cache_lock = threading.Lock()
+
+# Only these fields are cached; full info dicts carry every format, thumbnail and caption track
+_INFO_FIELDS = ('title', 'uploader', 'duration', 'view_count')
+_FORMAT_FIELDS = ('format_id', 'height', 'fps', 'filesize', 'filesize_approx', 'url', 'http_headers')
+
+# Store user sessions in Redis so they survive restarts and are shared across workers
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+SESSION_TTL = 900  # seconds
+R = redis.from_url(REDIS_URL)
+
+@dataclass(slots=True)
+class Session:
+    """Pending resolution choice, stored as parallel lists instead of format dicts."""
+    video_id: str
+    video_title: str
+    format_ids: list
+    resolutions: list
+    sizes: list  # bytes
+    message_id: int
+
+def _session_key(user_id):
+    return f"sess:{user_id}"
+
+def _ydl():
+    """Return this thread's YoutubeDL instance, creating it on first use."""
+    ydl = getattr(_ydl_local, 'ydl', None)
+    if ydl is None:
+        ydl = _ydl_local.ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+    return ydl
+
+def _get_info(video_id):
+    """Return cached, trimmed video metadata; blocking, so call it through asyncio.to_thread.
+
+    'formats' holds only the progressive MP4 formats, highest resolution first.
+    """
+    now = time.monotonic()
+    with _info_cache_lock:
+        entry = _info_cache.get(video_id)
+        if entry and entry[0] > now:
+            _info_cache.move_to_end(video_id)
+            return entry[1]
+    
+    raw = _ydl().extract_info(f"https://youtu.be/{video_id}", download=False)
+    info = {field: raw.get(field) for field in _INFO_FIELDS}
+    info['formats'] = [
+        {field: f.get(field) for field in _FORMAT_FIELDS}
+        for f in _mp4_formats(raw)
+    ]
+    
+    with _info_cache_lock:
+        _info_cache[video_id] = (now + INFO_CACHE_TTL, info)
+        _info_cache.move_to_end(video_id)
+        while len(_info_cache) > INFO_CACHE_SIZE:
+            _info_cache.popitem(last=False)
+    return info
+
+def _mp4_formats(info):
+    """Progressive (audio+video) MP4 formats, highest resolution first."""
+    formats = [
+        f for f in info.get('formats', [])
+        if f.get('ext') == 'mp4'
+        and f.get('height')
+        and f.get('vcodec') != 'none'
+        and f.get('acodec') != 'none'
+        and f.get('protocol') in ('http', 'https')
+    ]
+    formats.sort(key=lambda f: f['height'], reverse=True)
+    return formats
+
+def _format_size(fmt):
+    """Exact size in bytes if known, else yt-dlp's estimate, else 0."""
+    return fmt.get('filesize') or fmt.get('filesize_approx') or 0
+
+# Static command replies, built once (legacy Markdown: *bold*)
+_NO_PREVIEW = LinkPreviewOptions(is_disabled=True)
+
+_START_TEXT = (
+    "👋 *YouTube Video Downloader Bot*\n\n"
+    "📥 Just send me any YouTube video URL and I'll download it for you!\n\n"
+    "⚡ *Features:*\n"
+    "• Auto 1080p MP4 download\n"
+    "• Multiple resolution options\n"
+    "• Fast downloading\n\n"
+    "📋 *Commands:*\n"
+    "/start - Show this message\n"
+    "/help - Show help\n"
+    "/about - About this bot"
+)
+
+_HELP_TEXT = (
+    "❓ *How to use:*\n\n"
+    "1. Send me a YouTube video URL\n"
+    "2. I'll try to download 1080p MP4 version\n"
+    "3. If 1080p not available, I'll show you all available resolutions\n"
+    "4. Choose a resolution by number\n\n"
+    "📌 *Supported URLs:*\n"
+    "• youtube.com/watch?v=...\n"
+    "• youtu.be/...\n"
+    "• Shorts and playlists (single videos)\n\n"
+    "⚠️ *Limitations:*\n"
+    "• Max 2GB file size (Telegram limit)\n"
+    "• Videos < 50 mins work best"
+)
+
+_ABOUT_TEXT = (
+    "🤖 *YT Video Downloader Bot*\n\n"
+    "📅 Version: 1.0\n"
+    "🛠 Created by: Rohit\n"
+    "📚 Powered by: yt-dlp & python-telegram-bot\n\n"
+    "📍 Hosted on: Render Cloud\n"
+    "⚡ Status: Online 24/7"
+)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /start is issued."""
-    await update.message.reply_text(
-        "👋 **YouTube Video Downloader Bot**\n\n"
-        "📥 Just send me any YouTube video URL and I'll download it for you!\n\n"
-        "⚡ **Features:**\n"
-        "• Auto 1080p MP4 download\n"
-        "• Multiple resolution options\n"
-        "• Fast downloading\n\n"
-        "📋 **Commands:**\n"
-        "/start - Show this message\n"
-        "/help - Show help\n"
-        "/about - About this bot"
-    )
+    await update.message.reply_text(_START_TEXT, parse_mode="Markdown", link_preview_options=_NO_PREVIEW)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send help message."""
-    await update.message.reply_text(
-        "❓ **How to use:**\n\n"
-        "1. Send me a YouTube video URL\n"
-        "2. I'll try to download 1080p MP4 version\n"
-        "3. If 1080p not available, I'll show you all available resolutions\n"
-        "4. Choose a resolution by number\n\n"
-        "📌 **Supported URLs:**\n"
-        "• youtube.com/watch?v=...\n"
-        "• youtu.be/...\n"
-        "• Shorts and playlists (single videos)\n\n"
-        "⚠️ **Limitations:**\n"
-        "• Max 2GB file size (Telegram limit)\n"
-        "• Videos < 50 mins work best"
-    )
+    await update.message.reply_text(_HELP_TEXT, parse_mode="Markdown", link_preview_options=_NO_PREVIEW)
 
 async def about_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send about message."""
-    await update.message.reply_text(
-        "🤖 **YT Video Downloader Bot**\n\n"
-        "📅 Version: 1.0\n"
-        "🛠 Created by: Rohit\n"
-        "📚 Powered by: pytube & python-telegram-bot\n\n"
-        "📍 Hosted on: Render Cloud\n"
-        "⚡ Status: Online 24/7"
-    )
+    await update.message.reply_text(_ABOUT_TEXT, parse_mode="Markdown", link_preview_options=_NO_PREVIEW)
 
 async def handle_video_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle YouTube URL."""
@@ -67,168 +224,307 @@ async def handle_video_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
     url = update.message.text.strip()
     
     # Validate URL
-    if not ("youtube.com" in url or "youtu.be" in url):
+    match = YT_RE.match(url)
+    if not match:
         await update.message.reply_text("❌ Please send a valid YouTube URL")
         return
+    video_id = match.group(1)
     
     try:
-        # Delete any previous session
-        if user_id in user_sessions:
-            del user_sessions[user_id]
-        
-        # Send processing message
-        processing_msg = await update.message.reply_text("⏳ Processing URL...")
-        
-        # Get video info
-        yt = YouTube(url)
-        
-        # Get best thumbnail
-        thumbnail_url = yt.thumbnail_url
+        # Delete any previous session while the video info loads
+        _, info = await asyncio.gather(
+            R.delete(_session_key(user_id)),
+            asyncio.to_thread(_get_info, video_id)
+        )
+        title = info['title'] or video_id
+        duration = info.get('duration') or 0
         
-        # Send video info
-        info_msg = await update.message.reply_text(
-            f"🎬 **{yt.title}**\n"
-            f"👤 Channel: {yt.author}\n"
-            f"⏱ Duration: {yt.length//60}:{yt.length%60:02d}\n"
-            f"👁 Views: {yt.views:,}\n\n"
-            f"🔍 Searching for 1080p quality..."
+        info_text = (
+            f"🎬 **{title}**\n"
+            f"👤 Channel: {info.get('uploader')}\n"
+            f"⏱ Duration: {duration//60}:{duration%60:02d}\n"
+            f"👁 Views: {info.get('view_count') or 0:,}\n\n"
         )
         
         # Look for 1080p
-        hd_streams = yt.streams.filter(
-            file_extension='mp4', 
-            res="1080p",
-            progressive=True
-        ).first()
+        formats = info['formats']
+        hd_format = next((f for f in formats if f['height'] == 1080), None)
         
-        if hd_streams:
-            await info_msg.edit_text(
+        if hd_format:
+            # Single message carries both the video info and download status
+            info_msg = await update.message.reply_text(
+                info_text +
                 f"✅ **1080p Quality Available!**\n"
-                f"📊 Resolution: 1080p\n"
-                f"💾 Size: {hd_streams.filesize_mb:.1f} MB\n\n"
+                f"💾 Size: {_format_size(hd_format) / (1024 * 1024):.1f} MB\n"
                 f"⏬ Downloading..."
             )
             
-            # Download with progress
-            await download_and_send_video(update, hd_streams, yt.title, "1080p")
+            # Download in the background; PTB tracks the task, reports its errors and awaits it on shutdown
+            context.application.create_task(
+                download_and_send_video(update, hd_format, title, "1080p", info_msg),
+                update=update
+            )
             
         else:
             # Show available resolutions
-            available_streams = yt.streams.filter(
-                file_extension='mp4', 
-                progressive=True
-            ).order_by('resolution').desc()
-            
-            if not available_streams:
-                await info_msg.edit_text("❌ No MP4 streams available for this video.")
+            if not formats:
+                await update.message.reply_text(info_text + "❌ No MP4 streams available for this video.")
                 return
             
             resolutions_text = "📋 **Available Resolutions:**\n\n"
-            streams_list = []
-            
-            for i, stream in enumerate(available_streams, 1):
-                if stream.resolution:
-                    size_mb = stream.filesize_mb if stream.filesize_mb else "Unknown"
-                    resolutions_text += f"{i}. {stream.resolution} ({stream.fps}fps) - {size_mb:.1f}MB\n"
-                    streams_list.append(stream)
+            for i, fmt in enumerate(formats, 1):
+                resolutions_text += f"{i}. {fmt['height']}p ({fmt.get('fps')}fps) - {_format_size(fmt) / (1024 * 1024):.1f}MB\n"
             
             resolutions_text += "\nReply with number to download (e.g., '1')"
             
-            await info_msg.edit_text(resolutions_text)
+            info_msg = await update.message.reply_text(info_text + resolutions_text)
             
             # Store session
-            user_sessions[user_id] = {
-                'streams': streams_list,
-                'video_title': yt.title,
-                'message_id': info_msg.message_id
-            }
-        
-        # Clean up processing message
-        await processing_msg.delete()
+            session = Session(
+                video_id=video_id,
+                video_title=title,
+                format_ids=[f['format_id'] for f in formats],
+                resolutions=[f"{f['height']}p" for f in formats],
+                sizes=[_format_size(f) for f in formats],
+                message_id=info_msg.message_id
+            )
+            await R.set(_session_key(user_id), orjson.dumps(session), ex=SESSION_TTL)
         
     except Exception as e:
-        logger.error(f"Error processing URL: {e}")
+        logger.error("Error processing URL: %s", e)
         await update.message.reply_text(f"❌ Error: {str(e)}")
 
 async def handle_resolution_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user's resolution choice."""
     user_id = update.effective_user.id
+    key = _session_key(user_id)
     
-    if user_id not in user_sessions:
+    # Take the session atomically so concurrent replies can't both start a download
+    raw = await R.getdel(key)
+    if raw is None:
         await update.message.reply_text("❌ No active session. Please send a YouTube URL first.")
         return
     
     try:
-        choice = int(update.message.text.strip())
-        session = user_sessions[user_id]
-        streams = session['streams']
-        video_title = session['video_title']
+        try:
+            choice = int(update.message.text.strip())
+        except ValueError:
+            # Not a choice; put the session back (unless a new URL replaced it) so they can retry
+            await R.set(key, raw, ex=SESSION_TTL, nx=True)
+            raise
+        session = Session(**orjson.loads(raw))
         
-        if 1 <= choice <= len(streams):
-            selected_stream = streams[choice - 1]
+        if 1 <= choice <= len(session.format_ids):
+            resolution = session.resolutions[choice - 1]
+            size_mb = session.sizes[choice - 1] / (1024 * 1024)
             
-            # Send downloading message
-            download_msg = await update.message.reply_text(
-                f"⏬ Downloading {selected_stream.resolution}...\n"
-                f"📊 Size: {selected_stream.filesize_mb:.1f} MB\n"
-                f"Please wait..."
+            # Re-resolve the format from its id while the downloading message is sent
+            format_id = session.format_ids[choice - 1]
+            download_msg, info = await asyncio.gather(
+                update.message.reply_text(
+                    f"⏬ Downloading {resolution}...\n"
+                    f"📊 Size: {size_mb:.1f} MB\n"
+                    f"Please wait..."
+                ),
+                asyncio.to_thread(_get_info, session.video_id)
             )
-            
-            # Download and send
-            await download_and_send_video(
-                update, 
-                selected_stream, 
-                video_title, 
-                selected_stream.resolution
+            selected_format = next(
+                (f for f in info.get('formats', []) if f['format_id'] == format_id),
+                None
             )
+            if selected_format is None:
+                await download_msg.delete()
+                await update.message.reply_text("❌ That format is no longer available. Please send the URL again.")
+                return
             
-            # Clean up
-            await download_msg.delete()
-            del user_sessions[user_id]
+            async def download_and_clean_up():
+                await download_and_send_video(
+                    update, 
+                    selected_format, 
+                    session.video_title, 
+                    resolution,
+                    download_msg
+                )
+                await download_msg.delete()
+            
+            # Download and send in the background
+            context.application.create_task(download_and_clean_up(), update=update)
             
         else:
-            await update.message.reply_text(f"❌ Please choose a number between 1 and {len(streams)}")
+            await R.set(key, raw, ex=SESSION_TTL, nx=True)
+            await update.message.reply_text(f"❌ Please choose a number between 1 and {len(session.format_ids)}")
     
     except ValueError:
         await update.message.reply_text("❌ Please enter a valid number")
     except Exception as e:
-        logger.error(f"Error in resolution choice: {e}")
+        logger.error("Error in resolution choice: %s", e)
         await update.message.reply_text(f"❌ Error: {str(e)}")
 
-async def download_and_send_video(update: Update, stream, title, resolution):
+async def _stream_to_disk(url, path, on_progress=None, headers=None):
+    """Stream a remote file to disk without blocking the event loop."""
+    async with aiohttp.ClientSession(timeout=DOWNLOAD_TIMEOUT, headers=headers) as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            total = response.content_length
+            done = 0
+            async with aiofiles.open(path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    await f.write(chunk)
+                    done += len(chunk)
+                    if on_progress and total:
+                        await on_progress(done, total)
+
+async def _parallel_download(url, total, path, on_progress=None, headers=None, conns=DL_CONNECTIONS):
+    """Fetch url in conns concurrent byte ranges, each written at its own offset."""
+    ranges = [(i * total // conns, (i + 1) * total // conns - 1) for i in range(conns)]
+    done = 0
+    
+    async with aiofiles.open(path, 'wb') as f:
+        await f.truncate(total)
+    
+    async with aiohttp.ClientSession(timeout=DOWNLOAD_TIMEOUT, headers=headers) as session:
+        async def fetch(lo, hi):
+            nonlocal done
+            async with session.get(url, headers={'Range': f'bytes={lo}-{hi}'}) as response:
+                response.raise_for_status()
+                if response.status != 206:
+                    raise RuntimeError("Server ignored the Range request")
+                # Each range gets its own handle so seeks never interleave
+                async with aiofiles.open(path, 'r+b', buffering=WRITE_BUFFER_SIZE) as f:
+                    await f.seek(lo)
+                    async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                        await f.write(chunk)
+                        done += len(chunk)
+                        if on_progress:
+                            await on_progress(done, total)
+        
+        # TaskGroup cancels the other ranges as soon as one fails
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for lo, hi in ranges:
+                    tg.create_task(fetch(lo, hi))
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0] from eg
+
+def _reserve_staging(size):
+    """Pick a staging dir for an exact size in bytes (None if unknown); returns (dir, bytes reserved in tmpfs)."""
+    global _shm_reserved
+    # Sparse/partial files don't show in free space yet, so count other downloads' reservations.
+    # This double-counts bytes they have already written, which errs on the side of disk.
+    if size and os.path.isdir(SHM_DIR):
+        free = shutil.disk_usage(SHM_DIR).free - _shm_reserved
+        if free > size + SHM_HEADROOM:
+            _shm_reserved += size
+            return SHM_DIR, size
+    os.makedirs("downloads", exist_ok=True)
+    return "downloads", 0
+
+def _progress_editor(progress_msg):
+    """Build a download progress callback that edits progress_msg at coarse milestones."""
+    last_edit_ts = time.monotonic()
+    last_percent = 0
+    
+    async def on_progress(done, total):
+        nonlocal last_edit_ts, last_percent
+        percent = done * 100 // total
+        now = time.monotonic()
+        if now - last_edit_ts < PROGRESS_EDIT_INTERVAL or percent - last_percent < PROGRESS_EDIT_STEP:
+            return
+        last_edit_ts, last_percent = now, percent
+        try:
+            await progress_msg.edit_text(f"{progress_msg.text}\n📶 Progress: {percent}%")
+        except TelegramError:
+            pass
+    
+    return on_progress
+
+async def download_and_send_video(update: Update, fmt, title, resolution, progress_msg=None):
     """Download video and send to user."""
+    global _dl_waiting
+    
+    # Claim a queue position before any await so concurrent arrivals get distinct counts
+    position = _dl_waiting
+    _dl_waiting += 1
+    try:
+        # Tell the user where they stand if every download slot is busy
+        if DL_SEM.locked():
+            if position:
+                await update.message.reply_text(f"⏳ In queue, {position} ahead of you")
+            else:
+                await update.message.reply_text("⏳ All download slots are busy, you're next in queue")
+        await DL_SEM.acquire()
+    finally:
+        _dl_waiting -= 1
+    
+    try:
+        await _download_and_send_video(update, fmt, title, resolution, progress_msg)
+    finally:
+        DL_SEM.release()
+
+async def _download_and_send_video(update: Update, fmt, title, resolution, progress_msg):
+    """Download video and send to user; caller must hold DL_SEM."""
+    global _shm_reserved
+    download_path = None
+    reserved = 0
     try:
-        # Create downloads directory
-        os.makedirs("downloads", exist_ok=True)
-        
         # Generate safe filename
-        safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        filename = f"downloads/{safe_title[:50]}_{resolution}.mp4"
+        safe_title = title.encode('ascii', 'ignore').decode().translate(_TRANS).rstrip()[:50] or "video"
+        
+        # Allocate a unique staging file
+        # Only an exact size can be reserved in tmpfs; estimates may be exceeded, so stage those on disk
+        staging_dir, reserved = _reserve_staging(fmt.get('filesize'))
+        with tempfile.NamedTemporaryFile(dir=staging_dir, suffix='.mp4', delete=False) as tmp:
+            download_path = tmp.name
         
         # Download the video
-        download_path = stream.download(output_path="downloads", filename=f"{safe_title[:50]}.mp4")
+        on_progress = _progress_editor(progress_msg) if progress_msg else None
+        # Ranges need the exact size; an estimate falls back to a single stream
+        headers = fmt.get('http_headers')
+        filesize = fmt.get('filesize')
+        if filesize and filesize >= MIN_PARALLEL_SIZE:
+            await _parallel_download(fmt['url'], filesize, download_path, on_progress, headers)
+        else:
+            await _stream_to_disk(fmt['url'], download_path, on_progress, headers)
+        
+        # Unlink while holding the fd; the kernel frees the file once the upload closes it
+        fd = os.open(download_path, os.O_RDONLY)
+        os.unlink(download_path)
+        download_path = None
         
         # Send to user
-        with open(download_path, 'rb') as video_file:
+        # Hand the file handle to the HTTP backend so it is streamed, not buffered
+        with os.fdopen(fd, 'rb') as video_file:
             await update.message.reply_video(
-                video=video_file,
+                video=InputFile(
+                    video_file,
+                    filename=f"{safe_title}.mp4",
+                    read_file_handle=False
+                ),
                 caption=f"🎬 {title}\n📊 Resolution: {resolution}",
                 supports_streaming=True,
-                read_timeout=60,
-                write_timeout=60,
                 connect_timeout=60
             )
         
-        # Clean up file
-        os.remove(download_path)
-        
     except Exception as e:
-        logger.error(f"Error downloading/sending video: {e}")
+        logger.error("Error downloading/sending video: %s", e)
         await update.message.reply_text(f"❌ Download failed: {str(e)}")
+    
+    finally:
+        # Clean up a partial file if the download itself failed
+        if download_path:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(download_path)
+        
+        # The upload has closed the fd by now, so the tmpfs space is free again
+        _shm_reserved -= reserved
+
+async def post_init(application: Application):
+    """Size the default executor used by asyncio.to_thread for yt-dlp calls."""
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=32))
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors."""
-    logger.error(f"Update {update} caused error {context.error}")
+    logger.error("Update %s caused error %s", update, context.error)
     
     if update and hasattr(update, 'effective_user'):
         try:
@@ -248,7 +544,34 @@ def main():
         return
     
     # Create Application
-    application = Application.builder().token(BOT_TOKEN).build()
+    # One large pooled HTTP/2 client for API calls, a small one for long polling
+    request = HTTPXRequest(
+        connection_pool_size=256,
+        read_timeout=60,
+        write_timeout=600,
+        media_write_timeout=600,  # file uploads use this, not write_timeout
+        connect_timeout=15,
+        http_version="2"
+    )
+    get_updates_request = HTTPXRequest(
+        connection_pool_size=8,
+        read_timeout=35
+    )
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(request)
+        .get_updates_request(get_updates_request)
+        .concurrent_updates(256)
+        .post_init(post_init)
+    )
+    if LOCAL_API_URL:
+        builder = (
+            builder
+            .base_url(f"{LOCAL_API_URL}/bot")
+            .base_file_url(f"{LOCAL_API_URL}/file/bot")
+        )
+    application = builder.build()
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
@@ -257,7 +580,7 @@ def main():
     
     # Message handlers
     application.add_handler(MessageHandler(
-        filters.TEXT & filters.Regex(r'(youtube\.com|youtu\.be)'), 
+        filters.TEXT & filters.Regex(YT_HOST_RE), 
         handle_video_url
     ))
     application.add_handler(MessageHandler(
@@ -274,10 +597,14 @@ def main():
     print("📡 Bot is now running on Render!")
     
     # Run bot
-    application.run_polling(
-        drop_pending_updates=True,
-        allowed_updates=Update.ALL_TYPES
-    )
+    log_listener.start()
+    try:
+        application.run_polling(
+            drop_pending_updates=True,
+            allowed_updates=Update.ALL_TYPES
+        )
+    finally:
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file